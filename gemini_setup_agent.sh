@@ -42,11 +42,15 @@ echo "Python version in venv: $(python --version)"
 # 3. Install Dependencies
 echo "Installing Python dependencies..."
 pip install google-generativeai python-dotenv requests
+# Optional accelerators: the agent falls back to the stdlib when any of these is missing
+pip install "orjson>=3.10" zstandard isal blake3 || echo "Optional accelerators (orjson, zstandard, isal, blake3) not installed; continuing without them."
 
 # 4. Create the Python Agent Script
 echo "Creating Python agent script: $PYTHON_SCRIPT_NAME..."
 cat <<'EOF' > "$PYTHON_SCRIPT_NAME"
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import subprocess
 import json
@@ -57,9 +61,18 @@ import sys
 import re
 import shutil
 import zipfile
+import zlib
+import select
 import signal
+import string
+import threading
+import time
 from datetime import datetime
 import hashlib
+import stat
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from dotenv import load_dotenv # For .env file
 
 # Attempt to import Gemini SDK
@@ -70,6 +83,252 @@ except ImportError:
     print("Google Generative AI SDK not installed. Please install it: pip install google-generativeai")
     sys.exit(1)
 
+# orjson is optional: it is much faster than the stdlib json module for the
+# state/context dumps and API responses, but we fall back to json if missing.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _atomic_write_bytes(path, data):
+    """Writes data to path through a temp file + os.replace, so a crash never leaves a half-written file."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode) # Keep permissions of a file being replaced
+    except FileNotFoundError:
+        mode = 0o644
+    try:
+        # Raw fd write: one-shot payload, no need for Python's buffered/text layers
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try: tmp_path.unlink()
+        except OSError: pass
+        raise
+
+def _tail(items, n):
+    """Last n items of a deque (or any reversible sequence), oldest first, without copying the rest."""
+    return list(islice(reversed(items), n))[::-1]
+
+# File hashes are only used for change detection, so prefer the SIMD-accelerated
+# BLAKE3 when installed and fall back to blake2b; both truncated to 128 bits.
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+FINGERPRINT_SIZE = 16 # bytes
+
+def _new_fingerprint():
+    """Returns a fresh hasher for file change detection (not for security)."""
+    if blake3 is not None:
+        return blake3.blake3()
+    return hashlib.blake2b(digest_size=FINGERPRINT_SIZE)
+
+def _fingerprint_hexdigest(hasher):
+    if blake3 is not None:
+        return hasher.hexdigest(length=FINGERPRINT_SIZE)
+    return hasher.hexdigest()
+
+# Driver for the long-lived tool worker (see SuperAIAgent._run_python_tool). It runs inside the
+# project's venv interpreter, pre-imports the Python tools once, then forks a child per request
+# so every pip/pytest/flake8/autopep8 run starts warm but with clean interpreter state. Children
+# leave with a normal sys.exit, so interpreter shutdown (atexit hooks, non-daemon threads, stdio
+# flush) runs as under a fresh `python -m ...`.
+_TOOL_WORKER_SOURCE = r'''
+import importlib, json, os, runpy, sys, tempfile, traceback
+for _mod in ("pip._internal.cli.main", "flake8.main.cli", "autopep8", "pytest"):
+    try: importlib.import_module(_mod)
+    except Exception: pass
+proto_out = sys.stdout
+for line in sys.stdin:
+    req = json.loads(line)
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        pid = os.fork()
+        if pid == 0:
+            rc = 1
+            try:
+                os.chdir(req["cwd"])
+                os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+                os.dup2(out.fileno(), 1)
+                os.dup2(err.fileno(), 2)
+                sys.argv = [req["target"]] + req["args"]
+                importlib.invalidate_caches()
+                runpy.run_module(req["target"], run_name="__main__", alter_sys=True)
+                rc = 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int): rc = e.code or 0
+                else: sys.stderr.write(f"{e.code}\n")
+            except BaseException:
+                traceback.print_exc()
+            sys.exit(rc) # Unwinds out of the request loop into normal interpreter shutdown
+        _, status = os.waitpid(pid, 0)
+        out.seek(0); err.seek(0)
+        rc = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        proto_out.write(json.dumps({"returncode": rc, "stdout": out.read().decode("utf-8", "replace"),
+                                    "stderr": err.read().decode("utf-8", "replace")}) + "\n")
+        proto_out.flush()
+'''
+
+# Bounds for the per-session logs: they are appended on every task and serialized on every save
+HISTORY_MAX = int(os.environ.get("AGENT_HISTORY_MAX", "200"))
+RESULTS_MAX = int(os.environ.get("AGENT_RESULTS_MAX", "50"))
+
+SMALL_FILE_BYTES = 4096 # Files up to this size are candidates for a verbatim preview (< 1000 chars)
+# Seconds to wait at the per-iteration prompt (interactive terminals only) before taking the
+# default "continue"; unset or 0 waits indefinitely as before
+PROMPT_TIMEOUT = float(os.environ.get("AGENT_PROMPT_TIMEOUT", "0")) or None
+
+def _timed_input(prompt, timeout):
+    """input() that returns None if a terminal user gives no answer within timeout seconds; EOFError at end of input."""
+    # select() only for TTYs: a pipe's read-ahead buffer would hide already-available lines from it
+    if timeout is None or sys.platform == "win32" or not sys.stdin.isatty():
+        return input(prompt)
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if not ready:
+        sys.stdout.write("\n")
+        return None
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip("\n")
+
+PIP_UPGRADE_INTERVAL = 24 * 3600 # Seconds before finalize upgrades pip again
+SUMMARY_WRITE_BUFFER = 1 << 17 # Write buffer for PROJECT_SUMMARY.md (CPython's default is 8 KiB)
+IO_POOL_WORKERS = 8 # Threads overlapping file reads/hashing when summarizing key files
+API_TIMEOUT = (3.05, 180) # (connect, read) seconds for HTTP API calls
+
+VENV_DIR = ".venv" # Mirrors the shell-level VENV_DIR; excluded from project scans
+
+_PRIORITY_NAME_PATTERNS = ("app.", "main.", "index.", "server.", "test_", "spec.")
+_PRIORITY_DOC_NAMES = frozenset(("README.md", "PROJECT_SUMMARY.md"))
+
+def _is_priority_file(name):
+    """True for main app, test and doc files (by base name), which lead the context's file summaries."""
+    return name in _PRIORITY_DOC_NAMES or any(p in name for p in _PRIORITY_NAME_PATTERNS)
+
+def _json_dumps(obj, indent=False):
+    """Serializes obj to UTF-8 encoded JSON bytes (orjson if available, else stdlib json)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=str, option=option)
+    return json.dumps(obj, indent=2 if indent else None, default=str).encode('utf-8')
+
+def _json_loads(data):
+    """Parses JSON from str or bytes (orjson if available, else stdlib json)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Persisted state is zstd-compressed (<name>.zst) when zstandard is installed;
+# plain JSON files are still read so older state keeps loading either way.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_LEVEL = 3
+_zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard is not None else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+def _zst_path(path):
+    return path.with_name(path.name + ".zst")
+
+def _write_state_file(path, data):
+    """Atomically writes data to path (or its .zst sibling, compressed), removing the stale other variant. Returns the path written."""
+    plain_path, zst_path = Path(path), _zst_path(Path(path))
+    if _zstd_compressor is not None:
+        target, stale, data = zst_path, plain_path, _zstd_compressor.compress(data)
+    else:
+        target, stale = plain_path, zst_path
+    _atomic_write_bytes(target, data)
+    try: stale.unlink()
+    except FileNotFoundError: pass
+    return target
+
+def _read_state_file(path):
+    """Returns the raw bytes of path, preferring its .zst sibling; None if neither exists."""
+    plain_path, zst_path = Path(path), _zst_path(Path(path))
+    if _zstd_decompressor is not None:
+        try:
+            return _zstd_decompressor.decompress(zst_path.read_bytes())
+        except FileNotFoundError:
+            pass
+    elif zst_path.exists() and not plain_path.exists():
+        raise RuntimeError(f"{zst_path} is zstd-compressed but the zstandard package is not installed")
+    try:
+        return plain_path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+# python-isal (Intel ISA-L) deflates whole buffers several times faster than stdlib zlib
+# and is API-compatible for what the archiver needs; fall back to zlib if missing.
+try:
+    from isal import isal_zlib as _deflate_zlib
+except ImportError:
+    _deflate_zlib = zlib
+
+ARCHIVE_INLINE_MAX = 16 << 20 # Larger files are deflated by ZipFile itself, streaming, on the calling thread
+ARCHIVE_COPY_BUFFER = 1 << 20 # Read/copy size when streaming those large files into the archive
+
+def _iter_archive_entries(root, arc_prefix=""):
+    """Yields (path, arcname, is_dir) for directories and regular files under root, depth-first in name order.
+
+    Like shutil.make_archive, anything else (dangling symlinks, FIFOs, sockets, devices) is skipped.
+    """
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        arcname = arc_prefix + entry.name # Prefix is built once per directory, no relpath per file
+        if entry.is_dir(follow_symlinks=False):
+            yield entry.path, arcname, True
+            yield from _iter_archive_entries(entry.path, arcname + "/")
+        elif entry.is_dir(): # Symlinks to directories are stored as entries, not followed
+            yield entry.path, arcname, True
+        elif entry.is_file(): # Follows symlinks: dangling links are False and skipped
+            yield entry.path, arcname, False
+
+def _deflate_file(path):
+    """Reads path and raw-deflates it (zip member format). Returns (size, CRC-32, compressed bytes)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    compressor = _deflate_zlib.compressobj(_deflate_zlib.Z_DEFAULT_COMPRESSION, _deflate_zlib.DEFLATED, -15)
+    return len(data), _deflate_zlib.crc32(data), compressor.compress(data) + compressor.flush()
+
+# ZipFile has no public API for appending already-compressed data, so _zip_write_deflated uses
+# these private members (the same sequence ZipFile.mkdir runs in CPython 3.11+). They may change
+# between Python versions: _zip_supports_raw_members gates the fast path, and archives built on an
+# interpreter without them fall back to ZipFile's own (serial) compression.
+_ZIPFILE_RAW_MEMBERS = ("_lock", "_seekable", "_writecheck", "_didModify", "start_dir", "fp", "filelist", "NameToInfo")
+
+def _zip_supports_raw_members(zf):
+    return all(hasattr(zf, name) for name in _ZIPFILE_RAW_MEMBERS) and hasattr(zipfile.ZipInfo, "FileHeader")
+
+def _zip_write_deflated(zf, zinfo, file_size, crc, compressed):
+    """Appends an already-deflated member to zf. Only call when _zip_supports_raw_members(zf)."""
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.file_size, zinfo.CRC, zinfo.compress_size = file_size, crc, len(compressed)
+    with zf._lock:
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.fp.write(zinfo.FileHeader())
+        zf.fp.write(compressed)
+        zf.start_dir = zf.fp.tell()
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+
 # Configure logging
 logging.basicConfig(
     filename='agent.log',
@@ -78,6 +337,47 @@ logging.basicConfig(
 )
 
 class SuperAIAgent:
+    # Fixed attribute layout: no per-instance __dict__, and faster attribute access in the action loop.
+    # Every attribute assigned on self must be listed here.
+    __slots__ = (
+        "gemini_api_key", "xai_api_key", "api_key", "api_url", "api_model_name",
+        "gemini_model_instance", "gemini_chat_session", "gemini_tools",
+        "_project_root", "_project_root_resolved", "language", "venv_path",
+        "task_results", "created_files", "installed_deps", "linting_results", "test_results",
+        "features", "task_history", "file_hashes", "_path_last_ts", "_summary_written", "_pip_upgraded_at", "current_iteration", "command",
+        "_summary_cache", "_context_cache", "_state_dirty_ctr", "_completeness_cache", "_io_pool", "_io_lock",
+        "state_file", "context_file", "_saved_state_fp", "_http",
+        "_tool_worker", "_tool_worker_python",
+        "action_definitions", "supported_actions", "_actions", "_grok_actions_json", "supported_linters", "required_tools_os",
+    )
+
+    _BAD_PATH_RE = re.compile(r'[<>:"|?*\x00-\x1F]') # Characters rejected in path parameters
+
+    _GROK_SYSTEM_PROMPT = """
+You are an expert coder AI. Your goal is to help build a software project based on user commands and provided context.
+You must respond with a JSON object containing a list of "tasks". Each task should have an "action" (from the supported list)
+and "parameters" (a dictionary of arguments for that action). Stick to the provided actions and parameter names.
+Prioritize addressing issues and missing features from the context.
+Example Task: { "action": "create_file", "parameters": {"path": "app/main.py", "content": "print('hello')", "feature": "core_logic" }}
+"""
+    _GROK_USER_PROMPT = string.Template("""
+User Command: '$user_command'
+Overall Project Goal: '$project_goal'
+Current Iteration: $iteration
+Project Context Summary:
+$context_json
+
+Supported Actions and their parameters (use these exact names):
+$actions_json
+""")
+
+    _NEXT_STEP_OPTIONS = """
+Options:
+1. Continue (AI suggests next steps based on overall command and context)
+2. Add/Refine specific feature (you provide a new focused command)
+3. Stop and finalize project
+4. Pause (save state and exit to resume later)"""
+
     def __init__(self, gemini_api_key, xai_api_key):
         self.gemini_api_key = gemini_api_key
         self.xai_api_key = xai_api_key
@@ -87,21 +387,37 @@ class SuperAIAgent:
         self.gemini_model_instance = None
         self.gemini_chat_session = None
 
+        self._state_dirty_ctr = 0 # Bumped whenever project state may have changed; keys the caches below
+        self._completeness_cache = None # (dirty counter, assessment dict)
         self.project_root = None
         self.language = "python"
         self.venv_path = None
         self.task_results = {} # For Grok's list of tasks
-        self.created_files = []
+        self.created_files = {} # resolved path -> {"feature": ..., "ts": ...}; dict for O(1) membership
         self.installed_deps = []
-        self.linting_results = []
-        self.test_results = []
-        self.features = []
-        self.task_history = [] # Will store more structured data for Gemini
+        self.linting_results = deque(maxlen=RESULTS_MAX)
+        self.test_results = deque(maxlen=RESULTS_MAX)
+        self.features = set()
+        self.task_history = deque(maxlen=HISTORY_MAX) # Will store more structured data for Gemini
         self.file_hashes = {}
+        self._path_last_ts = {} # resolved path -> epoch seconds of the last action that targeted it
+        self._summary_written = None # [content fingerprint, mtime_ns, size] of the last PROJECT_SUMMARY.md written
+        self._pip_upgraded_at = None # Epoch seconds of the last successful finalize-time pip upgrade
+        self._summary_cache = {} # path -> (fingerprint, summary dict) for unchanged files
+        self._context_cache = None # (cache key, encoded context bytes)
+        self._io_pool = None # ThreadPoolExecutor for file summaries, created on first use and reused
+        self._io_lock = threading.Lock() # Guards file_hashes/_summary_cache writes from pool threads
         self.current_iteration = 0
         self.state_file = Path("agent_state.json")
         self.context_file = Path("context_summary.json")
+        self._saved_state_fp = None # Fingerprint of the last state written, minus its last_updated stamp
+        # One pooled keep-alive session for REST calls, so iterations reuse the TCP/TLS connection
+        self._http = requests.Session()
+        self._http.headers.update({"Content-Type": "application/json"})
+        self._http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.3)))
         self.command = None
+        self._tool_worker = None # Popen of the warm Python tool worker, started on first use
+        self._tool_worker_python = None # Interpreter the worker was started with
 
         self.action_definitions = {
             "create_directory": {"description": "Creates a new directory.", "params": {"path": {"type": "STRING", "description": "Path for the new directory.", "required": True}}},
@@ -121,12 +437,27 @@ class SuperAIAgent:
             "user_clarification_needed": {"description": "Ask the user for clarification if the next step is ambiguous or more information is needed.", "params": {"question": {"type": "STRING", "description": "The question to ask the user for clarification.", "required": True}}}
         }
         self.supported_actions = set(self.action_definitions.keys())
+        # Dispatch table: action name -> bound _action_* handler, resolved once instead of per task
+        self._actions = {name: handler for name in self.action_definitions
+                         if callable(handler := getattr(self, f"_action_{name}", None))}
+        self._grok_actions_json = _json_dumps({name: details['params'] for name, details in self.action_definitions.items()}, indent=True).decode('utf-8')
         self.gemini_tools = None
 
         self.supported_linters = {"python": "flake8", "nodejs": "eslint"}
         self.required_tools_os = {"python": "python3", "git": "git"}
         signal.signal(signal.SIGINT, self.save_state_and_exit)
 
+    @property
+    def project_root(self):
+        return self._project_root
+
+    @project_root.setter
+    def project_root(self, value):
+        # Keep the resolved root alongside so path checks don't re-resolve it (syscalls) on every task
+        self._project_root = Path(value) if value else None
+        self._project_root_resolved = self._project_root.resolve() if self._project_root else None
+        self._state_dirty_ctr += 1
+
     def _initialize_gemini_tools(self):
         function_declarations = []
         for action_name, details in self.action_definitions.items():
@@ -222,25 +553,34 @@ class SuperAIAgent:
             "task_results": self.task_results,
             "created_files": self.created_files,
             "installed_deps": self.installed_deps,
-            "linting_results": self.linting_results,
-            "test_results": self.test_results,
-            "features": self.features,
-            "task_history": self.task_history,
+            "linting_results": list(self.linting_results),
+            "test_results": list(self.test_results),
+            "features": sorted(self.features), # Sorted to keep the state file stable and diff-friendly
+            "task_history": list(self.task_history),
             "file_hashes": self.file_hashes,
+            "path_last_ts": self._path_last_ts,
+            "summary_written": self._summary_written,
+            "pip_upgraded_at": self._pip_upgraded_at,
             "current_iteration": self.current_iteration,
             "command": self.command,
             "api_model_name": self.api_model_name,
-            "last_updated": datetime.now().isoformat(),
-            "gemini_chat_history": gemini_history_serializable
+            "gemini_chat_history": gemini_history_serializable,
+            "last_updated": datetime.now().isoformat() # Keep last: the fingerprint below covers everything before it
         }
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state, f, indent=2)
-            logging.info(f"Saved state to {self.state_file}")
+            state_bytes = _json_dumps(state, indent=True)
+            hasher = _new_fingerprint()
+            hasher.update(memoryview(state_bytes)[:state_bytes.rfind(b'"last_updated"')])
+            state_fp = _fingerprint_hexdigest(hasher)
+            if state_fp == self._saved_state_fp:
+                logging.info("State unchanged since last save; skipping write.")
+                return
+            written = _write_state_file(self.state_file, state_bytes)
+            logging.info(f"Saved state to {written}")
             context = self.get_context_summary() # Generate fresh context summary
-            with open(self.context_file, 'w') as f:
-                json.dump(context, f, indent=2)
-            logging.info(f"Saved context summary to {self.context_file}")
+            written = _write_state_file(self.context_file, self._encoded_context(context))
+            logging.info(f"Saved context summary to {written}")
+            self._saved_state_fp = state_fp
         except Exception as e:
             logging.error(f"Error during save_state file operations: {e}", exc_info=True)
 
@@ -288,11 +628,12 @@ class SuperAIAgent:
 
 
     def load_state(self):
-        if not self.state_file.exists():
-            return False
         try:
-            with open(self.state_file, 'r') as f:
-                state = json.load(f)
+            state_bytes = _read_state_file(self.state_file)
+            if state_bytes is None:
+                return False
+            state = _json_loads(state_bytes)
+            self._state_dirty_ctr += 1
             
             project_root_str = state.get("project_root")
             self.project_root = Path(project_root_str) if project_root_str else None
@@ -303,13 +644,19 @@ class SuperAIAgent:
             self.venv_path = Path(venv_path_str) if venv_path_str else None
             
             self.task_results = state.get("task_results", {})
-            self.created_files = state.get("created_files", [])
+            created_files = state.get("created_files", {})
+            if isinstance(created_files, list): # Older state files stored a plain list of paths
+                created_files = {f: {} for f in created_files}
+            self.created_files = created_files
             self.installed_deps = state.get("installed_deps", [])
-            self.linting_results = state.get("linting_results", [])
-            self.test_results = state.get("test_results", [])
-            self.features = state.get("features", [])
-            self.task_history = state.get("task_history", [])
+            self.linting_results = deque(state.get("linting_results", []), maxlen=RESULTS_MAX)
+            self.test_results = deque(state.get("test_results", []), maxlen=RESULTS_MAX)
+            self.features = set(state.get("features", []))
+            self.task_history = deque(state.get("task_history", []), maxlen=HISTORY_MAX)
             self.file_hashes = state.get("file_hashes", {})
+            self._path_last_ts = state.get("path_last_ts", {})
+            self._summary_written = state.get("summary_written")
+            self._pip_upgraded_at = state.get("pip_upgraded_at")
             self.current_iteration = state.get("current_iteration", 0)
             self.command = state.get("command")
             loaded_api_model_name = state.get("api_model_name")
@@ -343,19 +690,22 @@ class SuperAIAgent:
             return False
 
     def clear_state(self):
-        if self.state_file.exists():
-            try: self.state_file.unlink()
-            except OSError as e: logging.error(f"Error removing state file: {e}")
-            logging.info("State file cleared")
-        if self.context_file.exists():
-            try: self.context_file.unlink()
-            except OSError as e: logging.error(f"Error removing context file: {e}")
-            logging.info("Context summary file cleared")
+        self._saved_state_fp = None
+        for path in (self.state_file, _zst_path(self.state_file)):
+            if path.exists():
+                try: path.unlink()
+                except OSError as e: logging.error(f"Error removing state file: {e}")
+                logging.info(f"State file {path} cleared")
+        for path in (self.context_file, _zst_path(self.context_file)):
+            if path.exists():
+                try: path.unlink()
+                except OSError as e: logging.error(f"Error removing context file: {e}")
+                logging.info(f"Context summary file {path} cleared")
 
     def get_file_summary(self, file_path_str):
         try:
             # Ensure project_root is a Path object if it exists
-            proj_root_path = Path(self.project_root) if self.project_root else Path.cwd()
+            proj_root_path = self.project_root if self.project_root else Path.cwd()
             
             # Resolve the file_path_str relative to project_root if it's not absolute
             path_obj = Path(file_path_str)
@@ -365,74 +715,137 @@ class SuperAIAgent:
                 path_obj = path_obj.resolve()
 
 
-            if not path_obj.is_file():
+            try:
+                st = path_obj.stat()
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
                 return {"path": str(path_obj), "summary": "File not found or is a directory"}
-            
-            with open(path_obj, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            file_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
-            # Use resolved, absolute path string for file_hashes dictionary key
-            self.file_hashes[str(path_obj)] = file_hash
-
-            if len(content) < 1000:
-                return {"path": str(path_obj), "content_preview": content[:500] + ("..." if len(content)>500 else ""), "hash": file_hash}
-
-            lines = content.splitlines()
-            summary = f"File Path: {path_obj}\n"
-            summary += "First 5 lines:\n" + "\n".join(lines[:5]) + "\n"
-            if len(lines) > 10:
-                 summary += "...\nLast 5 lines:\n" + "\n".join(lines[-5:]) + "\n"
 
-            signatures = [line.strip() for line in lines if line.strip().startswith(("def ", "class ", "function ", "const ", "var ", "let "))]
-            if signatures:
-                summary += "Key definitions preview (up to 5):\n" + "\n".join(signatures[:5]) + "\n"
-            return {"path": str(path_obj), "summary": summary, "hash": file_hash}
+            # Use resolved, absolute path string for file_hashes dictionary key
+            path_key = str(path_obj)
+            file_hash = self._cached_file_hash(path_key, st)
+            if file_hash is not None:
+                cached_summary = self._summary_cache.get(path_key)
+                if cached_summary and cached_summary[0] == file_hash: # Unchanged file: reuse summary verbatim
+                    return cached_summary[1]
+            hasher = _new_fingerprint() if file_hash is None else None # Only rehash if mtime/size changed
+            # Single streaming pass: hash every line, but only keep what the summary shows
+            # (a small-file prefix, first/last 5 lines, first 5 signatures) instead of the whole file.
+            small_chunks, small_size = [], 0
+            head_lines, tail_lines, signatures = [], deque(maxlen=5), []
+            line_count = 0
+            with open(path_obj, 'rb') as f:
+                for raw_line in f:
+                    if hasher: hasher.update(raw_line)
+                    if small_size <= SMALL_FILE_BYTES:
+                        small_chunks.append(raw_line)
+                        small_size += len(raw_line)
+                    line = raw_line.decode('utf-8', errors='ignore').rstrip('\r\n')
+                    line_count += 1
+                    if line_count <= 5:
+                        head_lines.append(line)
+                    tail_lines.append(line)
+                    if len(signatures) < 5:
+                        stripped = line.strip()
+                        if stripped.startswith(("def ", "class ", "function ", "const ", "var ", "let ")):
+                            signatures.append(stripped)
+            content = None
+            if small_size <= SMALL_FILE_BYTES: # Same newline handling as a text-mode read
+                content = b''.join(small_chunks).decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+            if hasher:
+                file_hash = _fingerprint_hexdigest(hasher)
+                with self._io_lock:
+                    self.file_hashes[path_key] = (st.st_mtime_ns, st.st_size, file_hash)
+
+            if content is not None and len(content) < 1000:
+                file_summary = {"path": path_key, "content_preview": content[:500] + ("..." if len(content)>500 else ""), "hash": file_hash}
+            else:
+                summary = f"File Path: {path_obj}\n"
+                summary += "First 5 lines:\n" + "\n".join(head_lines) + "\n"
+                if line_count > 10:
+                     summary += "...\nLast 5 lines:\n" + "\n".join(tail_lines) + "\n"
+
+                if signatures:
+                    summary += "Key definitions preview (up to 5):\n" + "\n".join(signatures) + "\n"
+                file_summary = {"path": path_key, "summary": summary, "hash": file_hash}
+            with self._io_lock:
+                self._summary_cache[path_key] = (file_hash, file_summary)
+            return file_summary
         except Exception as e:
             logging.error(f"Failed to summarize file {file_path_str} (resolved: {path_obj if 'path_obj' in locals() else 'N/A'}): {e}", exc_info=True)
             return {"path": str(file_path_str), "summary": f"Error summarizing file: {e}"}
 
 
+    def _cached_file_hash(self, path_key, st):
+        """Returns the cached hash for path_key if its (mtime_ns, size) still match st, else None."""
+        cached = self.file_hashes.get(path_key)
+        # Entries are (mtime_ns, size, fingerprint); lists after a JSON round-trip, plain strings in old state files
+        if isinstance(cached, (list, tuple)) and len(cached) == 3 and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        return None
+
+    def _record_file_hash(self, path_obj, data):
+        """Stores the hash of freshly written bytes together with the file's stat fingerprint."""
+        st = path_obj.stat()
+        hasher = _new_fingerprint()
+        hasher.update(data)
+        self.file_hashes[str(path_obj)] = (st.st_mtime_ns, st.st_size, _fingerprint_hexdigest(hasher))
+
+    def _encoded_context(self, context):
+        """Returns context as indented JSON bytes, reusing the last encoding if nothing it depends on changed."""
+        # Key: per-file hashes of the summarized files plus counters that move whenever state changed.
+        # Back-to-back calls (e.g. save_state followed by send_to_api, or retries) skip re-encoding.
+        cache_key = (
+            tuple(s.get("hash") for s in context["key_file_summaries"]),
+            self.current_iteration, self._state_dirty_ctr, self.command
+        )
+        if self._context_cache and self._context_cache[0] == cache_key:
+            return self._context_cache[1]
+        encoded = _json_dumps(context, indent=True)
+        self._context_cache = (cache_key, encoded)
+        return encoded
+
     def get_context_summary(self):
         completeness = self.assess_project_completeness()
         
+        def get_mtime_safe(f_path_str):
+            # Be careful with stat() if f could be non-existent due to state/reality mismatch
+            try:
+                return os.stat(f_path_str).st_mtime
+            except OSError:
+                return 0 # Oldest if not found
+
         key_files_paths_to_summarize = []
         if self.project_root and self.project_root.exists():
             # Get all files, then filter
-            all_project_files = [str(f.resolve()) for f in self.project_root.rglob("*") if f.is_file() and ".git" not in f.parts and VENV_DIR not in f.parts] # Exclude .git and venv
+            all_project_files = [f for f in self.project_root.rglob("*") if f.is_file() and ".git" not in f.parts and VENV_DIR not in f.parts] # Exclude .git and venv
             
-            # Prioritize main application files and tests
-            priority_patterns = ["app.", "main.", "index.", "server.", "test_", "spec."]
-            readme_patterns = ["README.md", "PROJECT_SUMMARY.md"]
-
-            priority_files = [f for f in all_project_files if any(p in Path(f).name for p in priority_patterns) or Path(f).name in readme_patterns]
+            # Prioritize main application files, tests and docs
+            priority_files = [str(f.resolve()) for f in all_project_files if _is_priority_file(f.name)]
             
-            # Add other recently created/modified files if space allows, preferring those tracked by the agent
-            other_tracked_files = [str(Path(self.project_root / f).resolve()) for f in self.created_files if Path(self.project_root / f).exists()]
+            # Add other recently created/modified files if space allows, preferring those tracked by the agent.
+            # created_files keys are already resolved absolute paths.
+            other_tracked_files = self._existing_paths(self.created_files)
             
             # Combine and unique, then sort by modification time (most recent first)
-            # Be careful with Path(f).stat() if f could be non-existent due to state/reality mismatch
+            # Files the agent acted on are ordered by that action's time (O(1) lookup), others by mtime
             combined_files = list(set(priority_files + other_tracked_files))
-            
-            def get_mtime_safe(f_path_str):
-                try:
-                    return Path(f_path_str).stat().st_mtime
-                except FileNotFoundError:
-                    return 0 # Oldest if not found
-
-            combined_files.sort(key=get_mtime_safe, reverse=True)
+            path_last_ts = self._path_last_ts
+            combined_files.sort(key=lambda f: path_last_ts.get(f) or get_mtime_safe(f), reverse=True)
             key_files_paths_to_summarize = combined_files[:10] # Max 10 file summaries
         else: # Fallback if project_root is not properly set
-            key_files_paths_to_summarize = sorted(
-                list(set(self.created_files)),
-                key=lambda x: Path(x).stat().st_mtime if Path(x).exists() else 0,
-                reverse=True
-            )[:5]
+            path_last_ts = self._path_last_ts
+            key_files_paths_to_summarize = sorted(self.created_files, key=lambda f: path_last_ts.get(f) or get_mtime_safe(f), reverse=True)[:5]
 
-        file_summaries = [self.get_file_summary(f) for f in key_files_paths_to_summarize]
+        if len(key_files_paths_to_summarize) > 1:
+            # Summaries are I/O-bound (stat + read + hash); overlap them on the shared pool
+            file_summaries = list(self._get_io_pool().map(self.get_file_summary, key_files_paths_to_summarize))
+        else:
+            file_summaries = [self.get_file_summary(f) for f in key_files_paths_to_summarize]
 
         recent_actions_for_summary = []
-        for task_entry in self.task_history[-5:]:
+        for task_entry in _tail(self.task_history, 5):
             entry_summary = {"action": task_entry.get("action"), "success": task_entry.get("success")}
             # Handle both dict 'task' (old format) and direct 'args' (new format)
             task_details = task_entry.get("task", task_entry.get("args", {}))
@@ -460,7 +873,7 @@ class SuperAIAgent:
             "metadata": {
                 "project_root": str(self.project_root) if self.project_root else "Not set",
                 "language": self.language,
-                "features_implemented": self.features,
+                "features_implemented": sorted(self.features),
                 "dependencies_installed": self.installed_deps,
                 "current_iteration": self.current_iteration,
                 "original_user_command": self.command,
@@ -474,7 +887,51 @@ class SuperAIAgent:
             "suggested_next_features": completeness["missing_features"]
         }
 
+    @staticmethod
+    def _existing_paths(paths):
+        """Filters paths to those that exist, listing each directory once instead of stat-ing every file in it."""
+        by_dir = {}
+        for p in paths:
+            by_dir.setdefault(os.path.dirname(p), []).append(p)
+        existing = []
+        for dir_path, dir_files in by_dir.items():
+            if len(dir_files) == 1: # A single stat is cheaper than a listing
+                if os.path.exists(dir_files[0]): existing.append(dir_files[0])
+                continue
+            try:
+                with os.scandir(dir_path) as it:
+                    names = {entry.name for entry in it}
+            except OSError:
+                continue # Directory itself is gone
+            existing.extend(p for p in dir_files if os.path.basename(p) in names)
+        return existing
+
+    def _get_io_pool(self):
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix="agent-io")
+        return self._io_pool
+
     def assess_project_completeness(self):
+        # Only actions (and state loads/resets) change what is assessed, so reuse the last result
+        # until the dirty counter moves. Saves the directory scans on every context build.
+        if self._completeness_cache is not None and self._completeness_cache[0] == self._state_dirty_ctr:
+            return self._completeness_cache[1]
+        completeness = self._assess_project_completeness()
+        self._completeness_cache = (self._state_dirty_ctr, completeness)
+        return completeness
+
+    @staticmethod
+    def _iter_project_files(root):
+        """Yields os.DirEntry objects for all files under root, skipping .git and the venv."""
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in (".git", VENV_DIR):
+                        yield from SuperAIAgent._iter_project_files(entry.path)
+                elif entry.is_file():
+                    yield entry
+
+    def _assess_project_completeness(self):
         score = 0
         issues = []
         if not self.project_root or not self.project_root.exists():
@@ -484,18 +941,17 @@ class SuperAIAgent:
         main_script_found = False
         main_patterns_py = ["app.py", "main.py", "server.py"]
         main_patterns_js = ["app.js", "main.js", "index.js", "server.js"]
-        for item in self.project_root.iterdir(): # Check only top level for main script
-            if item.is_file():
-                if self.language == "python" and item.name in main_patterns_py: main_script_found = True; break
-                if self.language == "nodejs" and item.name in main_patterns_js: main_script_found = True; break
+        main_patterns = set(main_patterns_py if self.language == "python" else main_patterns_js if self.language == "nodejs" else ())
+        with os.scandir(self.project_root) as it: # Check only top level for main script
+            main_script_found = any(entry.name in main_patterns and entry.is_file() for entry in it)
         if main_script_found: score += 20
         else: issues.append(f"No main application script (e.g., {'/'.join(main_patterns_py if self.language=='python' else main_patterns_js)}) found in project root.")
 
         test_files_found = False
-        for item in self.project_root.rglob('*'): # Search recursively for tests
-            if item.is_file():
-                if self.language == "python" and (item.name.startswith("test_") and item.name.endswith(".py")): test_files_found = True; break
-                if self.language == "nodejs" and (item.name.endswith(".test.js") or item.name.endswith(".spec.js")): test_files_found = True; break
+        for entry in self._iter_project_files(self.project_root): # Search recursively for tests
+            name = entry.name
+            if self.language == "python" and (name.startswith("test_") and name.endswith(".py")): test_files_found = True; break
+            if self.language == "nodejs" and (name.endswith(".test.js") or name.endswith(".spec.js")): test_files_found = True; break
         if test_files_found: score += 20
         else: issues.append("No test files found in the project.")
         
@@ -571,7 +1027,7 @@ class SuperAIAgent:
             if ".." in path_arg_value.split(os.sep): # Disallow ".." for path traversal attempts in relative paths
                 # More robust checks happen in action handlers using project_root
                 logging.warning(f"Path parameter '{path_arg_value}' for action '{action_name}' contains '..'. This will be resolved against project root but proceed with caution.")
-            if re.search(r'[<>:"|?*\x00-\x1F]', path_arg_value):
+            if self._BAD_PATH_RE.search(path_arg_value):
                 logging.error(f"Invalid characters in path parameter '{path_arg_value}' for action '{action_name}'")
                 return False
         return True
@@ -592,7 +1048,10 @@ class SuperAIAgent:
                 return False
 
             logging.info(f"Attempting to install linter: {' '.join(cmd_list)} in {self.project_root}")
-            result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
+            if self.language == "python":
+                result = self._run_python_tool(cmd_list, cwd=self.project_root)
+            else:
+                result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
 
             if result.returncode != 0:
                 err_msg = f"Failed to install {tool_name}. RC: {result.returncode}\nStdout: {result.stdout}\nStderr: {result.stderr}"
@@ -606,6 +1065,54 @@ class SuperAIAgent:
             return False
 
 
+    def _run_python_tool(self, cmd_list, cwd):
+        """Runs a `[python, "-m", module, ...]` command list.
+
+        Uses the warm tool worker so each pip/pytest/flake8/autopep8 run skips interpreter
+        startup and imports. Falls back to a fresh subprocess if fork is unavailable or the worker breaks.
+        Returns a text-mode subprocess.CompletedProcess either way.
+        """
+        if hasattr(os, "fork"):
+            try:
+                result = self._tool_worker_call(cmd_list, cwd)
+                if cmd_list[1:4] == ["-m", "pip", "install"]:
+                    self._stop_tool_worker() # Pre-imported packages may have been upgraded
+                return result
+            except (OSError, ValueError) as e:
+                logging.warning(f"Tool worker failed ({e}), falling back to a fresh interpreter for: {' '.join(cmd_list)}")
+                self._stop_tool_worker()
+        return subprocess.run(cmd_list, cwd=cwd, capture_output=True, text=True, check=False)
+
+    def _tool_worker_call(self, cmd_list, cwd):
+        python_exe = cmd_list[0]
+        if self._tool_worker is None or self._tool_worker.poll() is not None or self._tool_worker_python != python_exe:
+            self._stop_tool_worker()
+            self._tool_worker = subprocess.Popen(
+                [python_exe, "-u", "-c", _TOOL_WORKER_SOURCE],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+            self._tool_worker_python = python_exe
+            logging.info(f"Started Python tool worker (pid {self._tool_worker.pid}) with {python_exe}")
+
+        request = {"target": cmd_list[2], "args": cmd_list[3:], "cwd": str(cwd)}
+        self._tool_worker.stdin.write(json.dumps(request) + "\n")
+        self._tool_worker.stdin.flush()
+        reply_line = self._tool_worker.stdout.readline()
+        if not reply_line:
+            raise OSError("tool worker exited unexpectedly")
+        reply = json.loads(reply_line)
+        return subprocess.CompletedProcess(cmd_list, reply["returncode"], reply["stdout"], reply["stderr"])
+
+    def _stop_tool_worker(self):
+        worker, self._tool_worker = self._tool_worker, None
+        if worker is None or worker.poll() is not None:
+            return
+        try:
+            worker.stdin.close() # Worker exits on EOF
+            worker.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            worker.kill()
+
     def send_to_api(self, user_message_content, is_retry=False, failed_task_context=None):
         context_summary = self.get_context_summary()
         logging.info(f"Preparing to send to {self.api_model_name}. Iteration: {self.current_iteration}.")
@@ -674,23 +1181,16 @@ class SuperAIAgent:
 
 
         elif self.api_model_name == "grok":
-            grok_system_prompt = """
-You are an expert coder AI. Your goal is to help build a software project based on user commands and provided context.
-You must respond with a JSON object containing a list of "tasks". Each task should have an "action" (from the supported list)
-and "parameters" (a dictionary of arguments for that action). Stick to the provided actions and parameter names.
-Prioritize addressing issues and missing features from the context.
-Example Task: { "action": "create_file", "parameters": {"path": "app/main.py", "content": "print('hello')", "feature": "core_logic" }}
-"""
-            grok_user_prompt = f"""
-User Command: '{user_message_content}'
-Overall Project Goal: '{self.command}'
-Current Iteration: {self.current_iteration}
-Project Context Summary:
-{json.dumps(context_summary, indent=2)}
-
-Supported Actions and their parameters (use these exact names):
-{json.dumps({name: details['params'] for name, details in self.action_definitions.items()}, indent=2)}
-"""
+            grok_system_prompt = self._GROK_SYSTEM_PROMPT
+            # Only the header lines vary per call; the context block comes pre-encoded (cached while
+            # state is unchanged) and the action list is encoded once in __init__.
+            grok_user_prompt = self._GROK_USER_PROMPT.substitute(
+                user_command=user_message_content,
+                project_goal=self.command,
+                iteration=self.current_iteration,
+                context_json=self._encoded_context(context_summary).decode('utf-8'),
+                actions_json=self._grok_actions_json
+            )
             if is_retry: grok_user_prompt += "\nThis is a retry. Please provide a corrected list of tasks, carefully considering the previous failure."
             if failed_task_context: grok_user_prompt += f"\nA previous task failed: {json.dumps(failed_task_context)}. Plan tasks to recover or work around this."
             grok_user_prompt += "\nNow, generate the JSON response with the list of tasks:"
@@ -705,24 +1205,26 @@ Supported Actions and their parameters (use these exact names):
                     "temperature": 0.2, # Low temperature for more deterministic tasks
                     "response_format": {"type": "json_object"} # Request JSON output if Grok API supports it
                 }
-                headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json", "X-API-Key": self.api_key} # Some APIs use X-API-Key
+                headers = {"Authorization": f"Bearer {self.api_key}", "X-API-Key": self.api_key} # Some APIs use X-API-Key
                 
                 logging.info(f"Sending to Grok API URL: {self.api_url}")
                 logging.debug(f"Grok request payload (user prompt part): {grok_user_prompt[:300]}...")
 
-                api_response = requests.post(self.api_url, json=payload, headers=headers, timeout=180)
+                api_response = self._http.post(self.api_url, json=payload, headers=headers, timeout=API_TIMEOUT)
                 api_response.raise_for_status() # Will raise HTTPError for bad responses (4xx or 5xx)
                 
-                result_json = api_response.json()
-                logging.debug(f"Grok raw response: {json.dumps(result_json, indent=2)}")
+                result_json = _json_loads(api_response.content) # Parse the raw bytes, no separate utf-8 decode
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug(f"Grok raw response: {api_response.text}")
 
                 tasks_json_str = result_json.get("choices", [{}])[0].get("message", {}).get("content", "")
                 if not tasks_json_str:
                     logging.error("Grok response missing expected content for tasks.")
                     return {"tasks": []} 
 
-                parsed_tasks_outer = json.loads(tasks_json_str) # Expects {"tasks": [...]}
-                if "tasks" not in parsed_tasks_outer or not isinstance(parsed_tasks_outer["tasks"], list):
+                # With response_format=json_object the content is sometimes already an object
+                parsed_tasks_outer = _json_loads(tasks_json_str) if isinstance(tasks_json_str, (str, bytes)) else tasks_json_str # Expects {"tasks": [...]}
+                if not isinstance(parsed_tasks_outer, dict) or "tasks" not in parsed_tasks_outer or not isinstance(parsed_tasks_outer["tasks"], list):
                     logging.error(f"Grok response JSON does not contain a 'tasks' list. Got: {tasks_json_str}")
                     return {"tasks": []}
                 return parsed_tasks_outer # Return the dict { "tasks": [...] }
@@ -760,9 +1262,10 @@ Supported Actions and their parameters (use these exact names):
         p = Path(path_str)
         if p.is_absolute():
             # If absolute, ensure it's within project_root for safety
-            if self.project_root and not str(p.resolve()).startswith(str(self.project_root.resolve())):
+            resolved = p.resolve()
+            if self._project_root_resolved and not resolved.is_relative_to(self._project_root_resolved):
                  raise ValueError(f"Path {p} is absolute and outside project root {self.project_root}")
-            return p.resolve()
+            return resolved
         return (base_path / p).resolve()
 
 
@@ -791,14 +1294,14 @@ Supported Actions and their parameters (use these exact names):
     def _action_create_file(self, path, content, feature=None, **kwargs):
         full_path = self._resolve_path(path)
         full_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        data = content.encode('utf-8')
+        _atomic_write_bytes(full_path, data)
         
         # Use string representation of resolved path for consistency in lists/dicts
         path_str_resolved = str(full_path)
-        if path_str_resolved not in self.created_files: self.created_files.append(path_str_resolved)
-        if feature and feature not in self.features: self.features.append(feature)
-        self.file_hashes[path_str_resolved] = hashlib.md5(content.encode('utf-8')).hexdigest()
+        self._track_created_file(path_str_resolved, feature)
+        if feature: self.features.add(feature)
+        self._record_file_hash(full_path, data)
         return f"File {full_path} created (feature: {feature or 'N/A'})."
 
     def _action_modify_file(self, path, content, feature=None, **kwargs):
@@ -808,21 +1311,26 @@ Supported Actions and their parameters (use these exact names):
             # Fall through to write, effectively creating it.
         
         full_path.parent.mkdir(parents=True, exist_ok=True) # Ensure parent exists
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        data = content.encode('utf-8')
+        _atomic_write_bytes(full_path, data)
         
         path_str_resolved = str(full_path)
-        if path_str_resolved not in self.created_files: self.created_files.append(path_str_resolved)
-        if feature and feature not in self.features: self.features.append(feature)
-        self.file_hashes[path_str_resolved] = hashlib.md5(content.encode('utf-8')).hexdigest()
+        self._track_created_file(path_str_resolved, feature)
+        if feature: self.features.add(feature)
+        self._record_file_hash(full_path, data)
         return f"File {full_path} modified (feature: {feature or 'N/A'})."
 
+    def _track_created_file(self, path_str, feature=None):
+        meta = self.created_files.setdefault(path_str, {})
+        meta["ts"] = datetime.now().isoformat()
+        if feature: meta["feature"] = feature
+
     def _action_delete_file(self, path, **kwargs):
         full_path = self._resolve_path(path)
         path_str_resolved = str(full_path)
-        if full_path.exists() and full_path.is_file():
+        if full_path.is_file(): # is_file() implies exists(), one stat instead of two
             full_path.unlink()
-            self.created_files = [f for f in self.created_files if f != path_str_resolved]
+            self.created_files.pop(path_str_resolved, None)
             if path_str_resolved in self.file_hashes: del self.file_hashes[path_str_resolved]
             return f"File {full_path} deleted."
         return f"File {full_path} not found or not a file, nothing to delete."
@@ -842,10 +1350,13 @@ Supported Actions and their parameters (use these exact names):
         else:
             raise ValueError(f"Unsupported language for dependency install: {self.language}")
 
-        result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
+        if self.language == "python":
+            result = self._run_python_tool(cmd_list, cwd=self.project_root)
+        else:
+            result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
         if result.returncode == 0:
             if dep_str not in self.installed_deps: self.installed_deps.append(dep_str)
-            if feature and feature not in self.features: self.features.append(feature)
+            if feature: self.features.add(feature)
             return f"Installed {dep_str} (feature: {feature or 'N/A'}). Output: {result.stdout[:200]}"
         else:
             raise RuntimeError(f"Failed to install {dep_str}. Error: {result.stderr or result.stdout}")
@@ -868,17 +1379,23 @@ Supported Actions and their parameters (use these exact names):
         repo_path = self._resolve_path(path)
         
         status_result = subprocess.run(["git", "status", "--porcelain"], cwd=repo_path, capture_output=True, text=True, check=False)
-        if not status_result.stdout.strip() and not Path(repo_path / ".git").exists(): # No .git means nothing to add/commit
+        if not status_result.stdout.strip() and not (repo_path / ".git").exists(): # No .git means nothing to add/commit
             return self._action_init_git(path=str(repo_path.relative_to(self.project_root) if self.project_root else repo_path)) + " Then, please try commit again."
         elif not status_result.stdout.strip():
              return f"No changes to commit in {repo_path}."
 
+        # Only tracked files changed: `commit -a` stages and commits in one process.
+        # Untracked ("??") entries still need an explicit `git add` first.
+        has_untracked = any(line.startswith("??") for line in status_result.stdout.splitlines())
+        if has_untracked:
+            add_result = subprocess.run(["git", "add", "."], cwd=repo_path, capture_output=True, text=True, check=False)
+            if add_result.returncode != 0:
+                logging.warning(f"git add . in {repo_path} might have failed or had issues: {add_result.stderr or add_result.stdout}")
+            commit_cmd = ["git", "commit", "-m", message]
+        else:
+            commit_cmd = ["git", "commit", "-a", "-m", message]
 
-        add_result = subprocess.run(["git", "add", "."], cwd=repo_path, capture_output=True, text=True, check=False)
-        if add_result.returncode != 0:
-            logging.warning(f"git add . in {repo_path} might have failed or had issues: {add_result.stderr or add_result.stdout}")
-
-        commit_result = subprocess.run(["git", "commit", "-m", message], cwd=repo_path, capture_output=True, text=True, check=False)
+        commit_result = subprocess.run(commit_cmd, cwd=repo_path, capture_output=True, text=True, check=False)
         if commit_result.returncode == 0:
             return f"Committed changes in {repo_path} with message: '{message}'. Output: {commit_result.stdout[:200]}"
         else:
@@ -907,6 +1424,7 @@ Supported Actions and their parameters (use these exact names):
         # Run from project root directory
         run_cwd = self.project_root if self.project_root else script_full_path.parent
 
+        # Fresh interpreter, not the tool worker: generated scripts may read the terminal via input()
         result = subprocess.run(cmd_list, cwd=run_cwd, capture_output=True, text=True, check=False)
         output = f"Stdout: {result.stdout[:500]}\nStderr: {result.stderr[:500]}"
         
@@ -933,7 +1451,7 @@ Supported Actions and their parameters (use these exact names):
 
         cmd_list = []
         if self.language == "python":
-            pip_freeze_res = subprocess.run([self.get_venv_python(), "-m", "pip", "freeze"], cwd=self.project_root, capture_output=True, text=True)
+            pip_freeze_res = self._run_python_tool([self.get_venv_python(), "-m", "pip", "freeze"], cwd=self.project_root)
             if 'pytest' not in pip_freeze_res.stdout:
                 logging.info("pytest not found, attempting to install...")
                 self._action_install_dependency(package="pytest", feature="testing_framework")
@@ -946,7 +1464,10 @@ Supported Actions and their parameters (use these exact names):
         else:
             raise ValueError(f"Unsupported language for running tests: {self.language}")
 
-        result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
+        if self.language == "python":
+            result = self._run_python_tool(cmd_list, cwd=self.project_root)
+        else:
+            result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
         output = f"Stdout: {result.stdout[:1000]}\nStderr: {result.stderr[:1000]}"
         
         success = result.returncode == 0
@@ -978,11 +1499,11 @@ Supported Actions and their parameters (use these exact names):
         if tool == "flake8" and self.language == "python":
             linter_executable = self.get_venv_python()
             if fix:
-                pip_freeze_res = subprocess.run([linter_executable, "-m", "pip", "freeze"], cwd=self.project_root, capture_output=True, text=True)
+                pip_freeze_res = self._run_python_tool([linter_executable, "-m", "pip", "freeze"], cwd=self.project_root)
                 if 'autopep8' not in pip_freeze_res.stdout:
                     self._action_install_dependency(package="autopep8", feature="linting_tool_fixer")
                 fix_cmd = [linter_executable, "-m", "autopep8", "--in-place", str(target_path_resolved)]
-                fix_run_result = subprocess.run(fix_cmd, cwd=self.project_root, capture_output=True, text=True, check=False)
+                fix_run_result = self._run_python_tool(fix_cmd, cwd=self.project_root)
                 if fix_run_result.returncode == 0: logging.info(f"Autopep8 ran on {target_path_resolved}.")
                 else: logging.warning(f"Autopep8 failed on {target_path_resolved}: {fix_run_result.stderr or fix_run_result.stdout}")
             cmd_list = [linter_executable, "-m", "flake8", str(target_path_resolved)]
@@ -1008,7 +1529,10 @@ Supported Actions and their parameters (use these exact names):
         else:
             raise ValueError(f"Unsupported linter {tool} or language {self.language}")
 
-        result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
+        if tool == "flake8":
+            result = self._run_python_tool(cmd_list, cwd=self.project_root)
+        else:
+            result = subprocess.run(cmd_list, cwd=self.project_root, capture_output=True, text=True, check=False)
         output_detail = f"LINT CMD: {' '.join(cmd_list)}\nStdout: {result.stdout[:500]}\nStderr: {result.stderr[:500]}"
         
         lint_message = f"Linting {target_path_resolved.name} with {tool}: "
@@ -1022,7 +1546,7 @@ Supported Actions and their parameters (use these exact names):
             lint_message += f"Issues found or errors occurred. Details:\n{output_detail}"
         
         self.linting_results.append(lint_message)
-        if feature and feature not in self.features: self.features.append(feature)
+        if feature: self.features.add(feature)
         return f"{lint_message[:200]}..." # Summary for FunctionResponse
 
     def _action_generate_docs(self, path, content, feature=None, **kwargs):
@@ -1041,11 +1565,12 @@ Supported Actions and their parameters (use these exact names):
         if not self._validate_action_params(action_name, args_dict):
              raise ValueError(f"Invalid parameters for action {action_name}: {args_dict}")
 
-        action_method_name = f"_action_{action_name}"
-        if not hasattr(self, action_method_name) or not callable(getattr(self, action_method_name)):
+        action_method = self._actions.get(action_name)
+        if action_method is None:
             raise NotImplementedError(f"Action '{action_name}' is not implemented in the agent.")
-        
-        action_method = getattr(self, action_method_name)
+
+        self._state_dirty_ctr += 1 # Even failed actions may have partially changed the project
+        self._note_path_activity(args_dict.get("path"))
         try:
             # Call the action method with unpacked arguments
             result_data = action_method(**args_dict) 
@@ -1070,7 +1595,18 @@ Supported Actions and their parameters (use these exact names):
             raise # Re-raise for the calling Gemini loop to handle and form an error FunctionResponse
 
 
-    def _validate_grok_task(self, task_item, task_idx, all_tasks):
+    def _note_path_activity(self, path_str):
+        """Records when an action last targeted path_str, so recency ordering needs no history scan or stat."""
+        if not path_str or not isinstance(path_str, str):
+            return
+        try:
+            self._path_last_ts[str(self._resolve_path(path_str))] = time.time()
+        except (ValueError, OSError):
+            pass # Invalid paths are reported by the action itself
+
+
+    def _validate_grok_task(self, task_item, task_idx, num_tasks):
+        """Structural checks only; whether dependencies succeeded is checked right before execution."""
         action = task_item.get("action")
         # Grok might put params under "parameters" or "params"
         params = task_item.get("parameters", task_item.get("params")) 
@@ -1092,13 +1628,9 @@ Supported Actions and their parameters (use these exact names):
             return False # Should be a list of indices
 
         for dep_idx in depends_on_indices:
-            if not (isinstance(dep_idx, int) and 0 <= dep_idx < len(all_tasks)):
+            if not (isinstance(dep_idx, int) and 0 <= dep_idx < num_tasks):
                 logging.error(f"Invalid dependency index {dep_idx} for Grok task {task_idx}")
                 return False
-            # Check if depended-upon task has successfully run (from self.task_results for Grok)
-            if dep_idx not in self.task_results or not self.task_results.get(dep_idx, False):
-                logging.warning(f"Grok task {task_idx} dependency on task {dep_idx} not met (failed or not run).")
-                return False 
         return True
 
     def _execute_grok_tasks(self, tasks_list_from_grok):
@@ -1107,53 +1639,40 @@ Supported Actions and their parameters (use these exact names):
             print("Error: AI response for tasks was not in the expected list format.")
             return False
 
-        # Reset task_results for this batch from Grok
-        self.task_results = {} # Stores success/failure of tasks in *this current batch*
-
-        valid_tasks_to_run = []
-        for i, task_item in enumerate(tasks_list_from_grok):
-            if self._validate_grok_task(task_item, i, tasks_list_from_grok):
-                valid_tasks_to_run.append((i, task_item)) # Store original index and task
-            else:
-                self.task_results[i] = False # Mark invalid task as failed
-
-        if not valid_tasks_to_run and tasks_list_from_grok: # Some tasks provided, but all were invalid
-            logging.error("All tasks from Grok were invalid. Attempting to ask for a retry.")
-            # Simplified retry logic
-            grok_response = self.send_to_api(self.command, is_retry=True, failed_task_context={"reason": "All tasks in the previous batch were invalid."})
-            if grok_response and "tasks" in grok_response and grok_response["tasks"]:
-                logging.info("Retrying with new tasks from Grok.")
-                return self._execute_grok_tasks(grok_response["tasks"])
-            logging.error("Grok retry failed to produce valid tasks.")
-            return False
-
+        # Reset task_results for this batch from Grok. Keep a local reference: recovery batches
+        # below rebind self.task_results, but dependency checks must see *this* batch's results.
+        task_results = self.task_results = {} # Stores success/failure of tasks in *this current batch*
+        num_tasks = len(tasks_list_from_grok)
+        execute_action = self._execute_action
 
+        # Single pass: each task is validated and its dependencies checked right before it runs,
+        # so results of earlier tasks in the batch are already known.
+        any_task_valid = False
         all_batch_tasks_successful = True
-        for original_idx, task_item in valid_tasks_to_run:
+        for original_idx, task_item in enumerate(tasks_list_from_grok):
+            if not self._validate_grok_task(task_item, original_idx, num_tasks):
+                task_results[original_idx] = False # Mark invalid task as failed
+                all_batch_tasks_successful = False
+                continue
+            any_task_valid = True
             action = task_item.get("action")
             params = task_item.get("parameters", task_item.get("params", {}))
             
-            # Double check dependencies just before execution, as task_results might update
-            depends_on_indices = task_item.get("depends_on", [])
-            dependencies_met_at_runtime = True
-            for dep_idx in depends_on_indices:
-                if not self.task_results.get(dep_idx, False): # Check if dependency succeeded
-                    dependencies_met_at_runtime = False; break
-            
-            if not dependencies_met_at_runtime:
-                logging.warning(f"Grok task {original_idx} ({action}) skipped: runtime dependency check failed.")
-                self.task_results[original_idx] = False
+            unmet_dep = next((dep_idx for dep_idx in task_item.get("depends_on", []) if not task_results.get(dep_idx, False)), None)
+            if unmet_dep is not None:
+                logging.warning(f"Grok task {original_idx} ({action}) skipped: dependency on task {unmet_dep} not met (failed or not run).")
+                task_results[original_idx] = False
                 all_batch_tasks_successful = False
                 continue
 
             try:
                 logging.info(f"Executing Grok task (original index {original_idx}): {action} with params {params}")
                 # Use the same _execute_action dispatcher. It logs to self.task_history.
-                self._execute_action(action, params) 
-                self.task_results[original_idx] = True # Mark as successfully executed for this batch
+                execute_action(action, params) 
+                task_results[original_idx] = True # Mark as successfully executed for this batch
             except Exception as e:
                 logging.error(f"Grok task (original index {original_idx}, action {action}) failed: {e}", exc_info=True)
-                self.task_results[original_idx] = False
+                task_results[original_idx] = False
                 all_batch_tasks_successful = False
                 # Attempt recovery for this specific failed task
                 # This recursive recovery can be complex. A simpler approach might be to mark failure and let the next main iteration handle it.
@@ -1170,6 +1689,16 @@ Supported Actions and their parameters (use these exact names):
                          logging.warning("Recovery tasks from Grok also failed or had issues.")
                 else:
                     logging.warning("Grok provided no recovery tasks or recovery failed.")
+
+        if not any_task_valid and tasks_list_from_grok: # Some tasks provided, but all were invalid (nothing ran)
+            logging.error("All tasks from Grok were invalid. Attempting to ask for a retry.")
+            # Simplified retry logic
+            grok_response = self.send_to_api(self.command, is_retry=True, failed_task_context={"reason": "All tasks in the previous batch were invalid."})
+            if grok_response and "tasks" in grok_response and grok_response["tasks"]:
+                logging.info("Retrying with new tasks from Grok.")
+                return self._execute_grok_tasks(grok_response["tasks"])
+            logging.error("Grok retry failed to produce valid tasks.")
+            return False
         return all_batch_tasks_successful
 
 
@@ -1178,124 +1707,216 @@ Supported Actions and their parameters (use these exact names):
             logging.warning("Project root not set or does not exist. Skipping finalization.")
             return
 
-        if self.language == "nodejs" and not (self.project_root / "package.json").exists():
-            logging.info("Attempting to create a basic package.json for Node.js project.")
-            try:
-                package_json_content = json.dumps({
-                    "name": self.project_root.name.lower().replace(" ", "-"), 
-                    "version": "1.0.0", 
-                    "description": f"Project: {self.command}",
-                    "main": "app.js", # Common default
-                    "scripts": {
-                        "start": "node app.js", # Common default
-                        "test": "echo \"Error: no test specified\" && exit 1"
-                    },
-                    "keywords": ["ai-generated", self.language],
-                    "author": "SuperAIAgent"
-                }, indent=2)
-                self._execute_action("create_file", {
-                    "path": str(self.project_root / "package.json"),
-                    "content": package_json_content,
-                    "feature": "project_setup"
-                })
-            except Exception as e:
-                logging.error(f"Failed to create package.json: {e}")
-
-        if self.venv_path and self.language == "python":
-            logging.info("Attempting to upgrade pip in virtual environment.")
-            cmd = [self.get_venv_python(), "-m", "pip", "install", "--upgrade", "pip"]
-            result = subprocess.run(cmd, cwd=self.project_root, capture_output=True, text=True, check=False)
-            if result.returncode == 0: logging.info("Upgraded pip in virtual environment.")
-            else: logging.warning(f"Failed to upgrade pip: {result.stderr or result.stdout}")
+        # Network-bound; runs while package.json and the summary are written, joined before archiving
+        pip_upgrade = self._start_pip_upgrade() if self.venv_path and self.language == "python" else None
 
-        summary_path = self.project_root / "PROJECT_SUMMARY.md"
-        completeness = self.assess_project_completeness()
-        summary_content = f"# Project Summary: {self.project_root.name}\n\n"
-        summary_content += f"- **Original Command**: {self.command}\n"
-        summary_content += f"- **Directory**: `{self.project_root}`\n"
-        summary_content += f"- **Language**: {self.language}\n"
-        summary_content += f"- **Final Completeness Score**: {completeness['score']}/100\n"
-        summary_content += f"- **Features Implemented**: {', '.join(self.features) or 'None'}\n"
-        summary_content += "- **Files Overview (sample)**:\n"
+        try:
+            # Resolved once by the project_root setter; derive every finalize path from it
+            root = self._project_root_resolved
+            project_name = root.name
+            package_json_path = root / "package.json"
+            if self.language == "nodejs" and not package_json_path.exists():
+                logging.info("Attempting to create a basic package.json for Node.js project.")
+                try:
+                    package_json_content = _json_dumps({
+                        "name": project_name.lower().replace(" ", "-"), 
+                        "version": "1.0.0", 
+                        "description": f"Project: {self.command}",
+                        "main": "app.js", # Common default
+                        "scripts": {
+                            "start": "node app.js", # Common default
+                            "test": "echo \"Error: no test specified\" && exit 1"
+                        },
+                        "keywords": ["ai-generated", self.language],
+                        "author": "SuperAIAgent"
+                    }, indent=True).decode('utf-8')
+                    self._execute_action("create_file", {
+                        "path": str(package_json_path),
+                        "content": package_json_content,
+                        "feature": "project_setup"
+                    })
+                except Exception as e:
+                    logging.error(f"Failed to create package.json: {e}")
+
+            summary_path = root / "PROJECT_SUMMARY.md"
+            completeness = self.assess_project_completeness()
+            features_str = ', '.join(sorted(self.features)) or 'None'
+            deps_str = ', '.join(self.installed_deps) or 'None'
+            issues_str = ', '.join(completeness['issues']) or 'None'
+            # Collect lines instead of growing one string with += per line; they are streamed to disk below
+            parts = [
+                f"# Project Summary: {project_name}\n",
+                f"- **Original Command**: {self.command}",
+                f"- **Directory**: `{self.project_root}`",
+                f"- **Language**: {self.language}",
+                f"- **Final Completeness Score**: {completeness['score']}/100",
+                f"- **Features Implemented**: {features_str}",
+                "- **Files Overview (sample)**:",
+            ]
+            append = parts.append
         
-        # List files relative to project root for summary
-        files_for_summary = []
-        if self.project_root and self.project_root.exists():
-            for item in self.project_root.rglob("*"):
-                 if item.is_file() and ".git" not in item.parts and VENV_DIR not in item.parts:
-                     try:
-                         files_for_summary.append(str(item.relative_to(self.project_root)))
-                     except ValueError: # If item is not under project_root (should not happen with rglob from root)
-                         files_for_summary.append(str(item)) 
-        else: # Fallback to created_files list
-            files_for_summary = [Path(f).name for f in self.created_files]
-
-
-        for f_rel_path in files_for_summary[:20]: 
-            summary_content += f"  - `{f_rel_path}`\n"
-        if len(files_for_summary) > 20: summary_content += "  - ... (and more)\n"
+            # List files relative to project root for summary
+            files_for_summary = []
+            if root.exists():
+                for item in root.rglob("*"):
+                     if item.is_file() and ".git" not in item.parts and VENV_DIR not in item.parts:
+                         try:
+                             files_for_summary.append(str(item.relative_to(root)))
+                         except ValueError: # If item is not under project_root (should not happen with rglob from root)
+                             files_for_summary.append(str(item)) 
+            else: # Fallback to created_files list
+                files_for_summary = [Path(f).name for f in self.created_files]
+
+
+            parts.extend(f"  - `{f_rel_path}`" for f_rel_path in files_for_summary[:20])
+            if len(files_for_summary) > 20: append("  - ... (and more)")
         
-        summary_content += f"- **Dependencies Installed**: {', '.join(self.installed_deps) or 'None'}\n"
-        summary_content += "- **Last Linting Results (sample)**:\n"
-        for res_str in self.linting_results[-3:]: summary_content += f"  - {res_str[:200].strip()}...\n"
-        if not self.linting_results: summary_content += "  - No linting results recorded.\n"
-        summary_content += "- **Last Test Results (sample)**:\n"
-        for res_str in self.test_results[-3:]: summary_content += f"  - {res_str[:200].strip()}...\n"
-        if not self.test_results: summary_content += "  - No test results recorded.\n"
-        summary_content += f"- **Identified Issues at End**: {', '.join(completeness['issues']) or 'None'}\n"
+            append(f"- **Dependencies Installed**: {deps_str}")
+            append("- **Last Linting Results (sample)**:")
+            parts.extend(f"  - {res_str[:200].strip()}..." for res_str in _tail(self.linting_results, 3))
+            if not self.linting_results: append("  - No linting results recorded.")
+            append("- **Last Test Results (sample)**:")
+            parts.extend(f"  - {res_str[:200].strip()}..." for res_str in _tail(self.test_results, 3))
+            if not self.test_results: append("  - No test results recorded.")
+            append(f"- **Identified Issues at End**: {issues_str}")
         
-        # Basic run instructions
-        summary_content += "\n## Basic Run Instructions:\n"
-        if self.language == "python":
-            venv_activate_cmd = f"source {self.venv_path.relative_to(Path.cwd())}/bin/activate" if self.venv_path else "source .venv/bin/activate"
-            summary_content += f"1. Activate virtual env: `{venv_activate_cmd}` (Linux/Mac) or `.\\{self.venv_path.name}\\Scripts\\activate` (Windows, assuming venv in project root)\n"
-            summary_content += f"2. Install dependencies (if needed): `pip install -r requirements.txt` (if a requirements.txt was created)\n"
-            summary_content += f"3. Run main script: `python app.py` (or your main script name)\n"
-            summary_content += f"4. Run tests: `pytest` (if pytest is used)\n"
-        elif self.language == "nodejs":
-            summary_content += f"1. Install dependencies: `npm install`\n"
-            summary_content += f"2. Run main script: `npm start` (if 'start' script in package.json) or `node app.js`\n"
-            summary_content += f"3. Run tests: `npm test` (if 'test' script in package.json)\n"
-
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            f.write(summary_content)
-        if str(summary_path) not in self.created_files: self.created_files.append(str(summary_path))
-        logging.info(f"Generated project summary: {summary_path}")
+            # Basic run instructions
+            append("\n## Basic Run Instructions:")
+            if self.language == "python":
+                venv_activate_cmd = f"source {self.venv_path.relative_to(Path.cwd())}/bin/activate" if self.venv_path else "source .venv/bin/activate"
+                venv_name = self.venv_path.name if self.venv_path else VENV_DIR
+                append(f"1. Activate virtual env: `{venv_activate_cmd}` (Linux/Mac) or `.\\{venv_name}\\Scripts\\activate` (Windows, assuming venv in project root)")
+                append("2. Install dependencies (if needed): `pip install -r requirements.txt` (if a requirements.txt was created)")
+                append("3. Run main script: `python app.py` (or your main script name)")
+                append("4. Run tests: `pytest` (if pytest is used)")
+            elif self.language == "nodejs":
+                append("1. Install dependencies: `npm install`")
+                append("2. Run main script: `npm start` (if 'start' script in package.json) or `node app.js`")
+                append("3. Run tests: `npm test` (if 'test' script in package.json)")
+
+            # Repeated finalize runs leave an identical summary untouched. The fingerprint of the rendered
+            # lines lives in agent state, and the file's own mtime/size must still match what was written,
+            # so a summary edited or truncated by the user is regenerated.
+            hasher = _new_fingerprint()
+            for line in parts:
+                hasher.update(line.encode('utf-8'))
+                hasher.update(b"\n")
+            summary_fp = _fingerprint_hexdigest(hasher)
+            try:
+                st = summary_path.stat()
+                summary_unchanged = self._summary_written == [summary_fp, st.st_mtime_ns, st.st_size]
+            except OSError:
+                summary_unchanged = False
+            if summary_unchanged:
+                logging.info(f"Project summary unchanged, not rewritten: {summary_path}")
+            else:
+                # Write line by line through a 128 KiB buffer rather than materializing the joined document
+                with open(summary_path, 'w', encoding='utf-8', buffering=SUMMARY_WRITE_BUFFER) as f:
+                    f.writelines(f"{line}\n" for line in parts)
+                st = summary_path.stat()
+                self._summary_written = [summary_fp, st.st_mtime_ns, st.st_size] # List: survives the JSON round-trip as-is
+                logging.info(f"Generated project summary: {summary_path}")
+            self._track_created_file(str(summary_path))
+        finally:
+            # The archive includes the venv, so pip must be settled; also reaps it if the summary failed
+            if pip_upgrade: self._finish_pip_upgrade(pip_upgrade)
 
         # Create ZIP archive
-        archive_base_name = self.project_root.name
-        archive_path = self.project_root.parent / f"{archive_base_name}_project_archive" # Name for zip, avoids .zip.zip
+        zip_path = root.parent / f"{project_name}_project_archive.zip"
 
-        logging.info(f"Creating project archive: {archive_path}.zip")
-        # Use shutil.make_archive for easier directory zipping
+        logging.info(f"Creating project archive: {zip_path}")
         try:
-            shutil.make_archive(str(archive_path), 'zip', self.project_root)
-            logging.info(f"Created project archive: {archive_path}.zip")
-            print(f"Project summary: {summary_path.resolve()}")
-            print(f"Project archive: {Path(str(archive_path) + '.zip').resolve()}")
+            self._write_project_archive(zip_path)
+            logging.info(f"Created project archive: {zip_path}")
+            print(f"Project summary: {summary_path}")
+            print(f"Project archive: {zip_path}")
         except Exception as e:
             logging.error(f"Failed to create project archive: {e}", exc_info=True)
-            print(f"Failed to create project archive. Check logs. Summary is at {summary_path.resolve()}")
+            print(f"Failed to create project archive. Check logs. Summary is at {summary_path}")
+        self.save_state() # Keep the summary fingerprint and pip upgrade time for the next finalize
 
 
-    def prompt_user_for_next_step(self):
-        completeness = self.assess_project_completeness()
-        print(f"\n--- Iteration {self.current_iteration} Review ({self.api_model_name}) ---")
-        print(f"Project: {self.project_root.name if self.project_root else 'N/A'}")
-        print(f"Language: {self.language}")
-        print(f"Completeness Score: {completeness['score']}/100")
-        if completeness['issues']: print(f"Identified Issues: {', '.join(completeness['issues'])}")
-        else: print("No major issues identified by completeness check.")
-        if completeness['missing_features']: print(f"Suggested Next Features: {', '.join(completeness['missing_features'])}")
-
-        print("\nOptions:")
-        print("1. Continue (AI suggests next steps based on overall command and context)")
-        print("2. Add/Refine specific feature (you provide a new focused command)")
-        print("3. Stop and finalize project")
-        print("4. Pause (save state and exit to resume later)")
+    def _start_pip_upgrade(self):
+        """Starts `pip install --upgrade pip` in the background; returns None if it already ran within PIP_UPGRADE_INTERVAL."""
+        if self._pip_upgraded_at and time.time() - self._pip_upgraded_at < PIP_UPGRADE_INTERVAL:
+            logging.info("Skipping pip upgrade: already done within the last day.")
+            return None
+        logging.info("Attempting to upgrade pip in virtual environment.")
+        cmd = [self.get_venv_python(), "-m", "pip", "install", "--upgrade", "pip"]
+        try:
+            # Only stderr is reported (on failure), so discard stdout and keep stderr as raw bytes
+            return subprocess.Popen(cmd, cwd=self.project_root, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            logging.warning(f"Failed to upgrade pip: {e}")
+            return None
+
+    def _finish_pip_upgrade(self, proc):
+        _, stderr = proc.communicate()
+        if proc.returncode == 0:
+            logging.info("Upgraded pip in virtual environment.")
+            self._stop_tool_worker() # Its pre-imported pip is stale now
+            self._pip_upgraded_at = time.time()
+        else: logging.warning(f"Failed to upgrade pip: {stderr.decode('utf-8', 'replace')}")
+
+    def _write_project_archive(self, zip_path):
+        """Zips the whole project tree (same contents as shutil.make_archive), deflating members on the I/O pool."""
+        root = str(self.project_root)
+        pool = self._get_io_pool()
+        pending = deque() # (path, arcname, future or None), written in order; bounds compressed data in flight
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf: # ZipFile is not thread-safe: writes stay here
+            parallel_deflate = _zip_supports_raw_members(zf)
+            if not parallel_deflate:
+                logging.info("zipfile internals not as expected; archiving without parallel compression.")
+            def flush_pending(keep):
+                while len(pending) > keep:
+                    path, arcname, future = pending.popleft()
+                    if future is None: # Directory, large file, or no parallel path: let ZipFile stream it
+                        zinfo = zipfile.ZipInfo.from_file(path, arcname)
+                        if zinfo.is_dir():
+                            zf.write(path, arcname)
+                            continue
+                        zinfo.compress_type = zipfile.ZIP_DEFLATED
+                        # zf.write copies through 8 KiB reads; use 1 MiB reads and copies instead
+                        with open(path, 'rb', buffering=ARCHIVE_COPY_BUFFER) as src, zf.open(zinfo, 'w') as dest:
+                            shutil.copyfileobj(src, dest, ARCHIVE_COPY_BUFFER)
+                    else:
+                        _zip_write_deflated(zf, zipfile.ZipInfo.from_file(path, arcname), *future.result())
+
+            for path, arcname, is_dir in _iter_archive_entries(root):
+                if is_dir or not parallel_deflate or os.stat(path).st_size > ARCHIVE_INLINE_MAX:
+                    pending.append((path, arcname, None))
+                else:
+                    pending.append((path, arcname, pool.submit(_deflate_file, path)))
+                flush_pending(IO_POOL_WORKERS * 2)
+            flush_pending(0)
+
+    def prompt_user_for_next_step(self, completeness=None):
+        if completeness is None:
+            completeness = self.assess_project_completeness()
+        # Emit the whole review block with one write instead of a print() per line
+        lines = [
+            f"\n--- Iteration {self.current_iteration} Review ({self.api_model_name}) ---",
+            f"Project: {self.project_root.name if self.project_root else 'N/A'}",
+            f"Language: {self.language}",
+            f"Completeness Score: {completeness['score']}/100",
+        ]
+        if completeness['issues']: lines.append(f"Identified Issues: {', '.join(completeness['issues'])}")
+        else: lines.append("No major issues identified by completeness check.")
+        if completeness['missing_features']: lines.append(f"Suggested Next Features: {', '.join(completeness['missing_features'])}")
+        lines.append(self._NEXT_STEP_OPTIONS)
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
         
         choice_prompt = "Enter choice (1-4) or type a new command/feature to work on: "
-        user_input_str = input(choice_prompt).strip()
+        try:
+            user_input_str = _timed_input(choice_prompt, PROMPT_TIMEOUT)
+        except EOFError: # stdin closed (Ctrl-D, batch run): keep the state resumable rather than finishing
+            print("\nNo more input available. Pausing.")
+            return {"action": "pause"}
+        if user_input_str is None:
+            print(f"No choice within {PROMPT_TIMEOUT:g}s. Continuing.")
+            user_input_str = ""
+        user_input_str = user_input_str.strip()
         
         if user_input_str == "1" or user_input_str.lower() == "continue" or not user_input_str: # Default to continue
             return {"action": "continue", "command": f"Continue enhancing project towards original goal: {self.command}"}
@@ -1317,9 +1938,11 @@ Supported Actions and their parameters (use these exact names):
 
         # API Model Selection (if not already set, e.g. from loaded state)
         if not self.api_model_name:
-            if initial_model_choice:
+            if initial_model_choice: # An explicit choice is tried once, never re-prompted
                 try: self.select_api(initial_model_choice)
-                except ValueError as e: print(e); return
+                except ValueError as e:
+                    print(e)
+                    return
             else:
                 available_models = []
                 if self.gemini_api_key and self.gemini_api_key != "DISABLED": available_models.append("gemini")
@@ -1328,15 +1951,16 @@ Supported Actions and their parameters (use these exact names):
                 if not available_models:
                     print("No API keys are configured. Cannot select an AI model.")
                     return
-                
+            
                 model_prompt = f"Select AI model ({'/'.join(available_models)}): "
                 while not self.api_model_name:
-                    model_choice_input = input(model_prompt).strip().lower()
-                    if model_choice_input not in available_models:
+                    model_choice = input(model_prompt).strip().lower()
+                    if model_choice not in available_models:
                         print(f"Invalid choice. Please select from {available_models}.")
                         continue
-                    try: self.select_api(model_choice_input); break
-                    except ValueError as e: print(e) # Catch if select_api itself raises for a valid key but other issue
+                    try: self.select_api(model_choice)
+                    except ValueError as e:
+                        print(e) # Catch if select_api itself raises for a valid key but other issue
 
         # State Loading / New Project Setup
         resumed_from_state = False
@@ -1374,8 +1998,14 @@ Supported Actions and their parameters (use these exact names):
             # Initialize other state vars for a fresh project
             self.language = "python" # Default, can be changed by AI
             self.venv_path = None
-            self.created_files, self.installed_deps, self.linting_results, self.test_results, self.features, self.task_history, self.file_hashes = [], [], [], [], [], [], {}
+            self.created_files, self.installed_deps, self.features, self.file_hashes = {}, [], set(), {}
+            self.linting_results, self.test_results = deque(maxlen=RESULTS_MAX), deque(maxlen=RESULTS_MAX)
+            self.task_history = deque(maxlen=HISTORY_MAX)
+            self._path_last_ts = {}
+            self._summary_written = None
+            self._pip_upgraded_at = None
             self.current_iteration = 0
+            self._state_dirty_ctr += 1
             if self.api_model_name == "gemini" and self.gemini_model_instance: # Reset chat history for new project
                 self.gemini_chat_session = self.gemini_model_instance.start_chat(history=[])
             logging.info(f"Starting new project: '{self.command}' in '{self.project_root}' using {self.api_model_name}")
@@ -1486,7 +2116,7 @@ Supported Actions and their parameters (use these exact names):
             if completeness["is_complete"]:
                 print("\nProject assessed as complete based on current metrics!")
             
-            user_next_step_details = self.prompt_user_for_next_step()
+            user_next_step_details = self.prompt_user_for_next_step(completeness)
             user_action = user_next_step_details["action"]
             
             if user_action == "stop":
@@ -1495,10 +2125,9 @@ Supported Actions and their parameters (use these exact names):
                 self.save_state_and_exit(None, None) # Uses the signal handler logic
             else: # continue, add_feature, or new_command
                 current_user_directive = user_next_step_details["command"]
-                if self.api_model_name == "gemini" and user_action == "new_command":
-                    logging.info(f"New user directive for Gemini: '{current_user_directive}'. Chat session continues.")
-                elif self.api_model_name == "grok" and user_action == "new_command":
-                     logging.info(f"New user directive for Grok: '{current_user_directive}'.")
+                if user_action == "new_command":
+                    session_note = " Chat session continues." if self.api_model_name == "gemini" else ""
+                    logging.info(f"New user directive for {str(self.api_model_name).capitalize()}: '{current_user_directive}'.{session_note}")
 
 
         # Loop finished (stop or break due to error)
@@ -1585,7 +2214,7 @@ echo "3. Run the agent script:"
 echo "   python $PYTHON_SCRIPT_NAME"
 echo ""
 echo "The agent will create an 'agent.log' file for logging."
-echo "It will also create 'agent_state.json' to save progress."
+echo "It will also create 'agent_state.json' (or 'agent_state.json.zst' when zstandard is installed) to save progress."
 echo "---------------------------------------------------------------------"
 
 # Deactivating the venv here is optional; the user's current shell session has it active.